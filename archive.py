@@ -0,0 +1,246 @@
+"""
+أرشفة السجلات القديمة (assessments / evaluations / plans) في جدول archived_records
+كـ blobs مضغوطة بـ zlib مع قاموس مشترك لكل نوع، لأن الخطط تتشابه في معظم نصها.
+
+الاستخدام (مثلاً من cron مرة يوميًا):
+    python archive.py                 # أرشفة + incremental_vacuum إن كان مفعّلًا
+    python archive.py --vacuum        # أرشفة + VACUUM كامل
+    python archive.py --enable-incremental   # تحويل القاعدة لـ auto_vacuum=INCREMENTAL (مرة واحدة)
+"""
+import json
+import zlib
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text, exists, or_
+from sqlalchemy.orm import Session, aliased
+
+from database import engine, SessionLocal
+from models import Assessment, Evaluation, Plan, ArchiveDict, ArchivedRecord
+
+KINDS = {
+    "assessment": Assessment,
+    "evaluation": Evaluation,
+    "plan": Plan,
+}
+ZDICT_MAX = 32 * 1024   # نافذة zlib القصوى
+ZDICT_SAMPLES = 50
+ZDICT_MIN_SAMPLES = 20
+ZDICT_NOVELTY = 0.15    # نضيف للقاموس فقط العينات التي لا يغطيها جيدًا
+BATCH_SIZE = 500
+VACUUM_FREELIST_RATIO = 0.25
+
+def _kind_of(model) -> str:
+    for k, m in KINDS.items():
+        if m is model:
+            return k
+    raise ValueError(f"unsupported model: {model!r}")
+
+def _row_payload(row) -> bytes:
+    cols = {c.key: getattr(row, c.key) for c in row.__table__.columns}
+    return json.dumps(cols, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _compress(raw: bytes, zdict: Optional[bytes]) -> bytes:
+    c = zlib.compressobj(9, zdict=zdict) if zdict else zlib.compressobj(9)
+    return c.compress(raw) + c.flush()
+
+def _decompress(blob: bytes, zdict: Optional[bytes]) -> bytes:
+    d = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+    return d.decompress(blob) + d.flush()
+
+def _train_zdict(samples: list[bytes]) -> bytes:
+    # zlib يطابق نهاية القاموس أفضل، فأول عينة (الأكثر تمثيلًا) توضع في النهاية
+    # ونقص الزائد من البداية
+    zdict = b""
+    for raw in samples:
+        if len(zdict) >= ZDICT_MAX:
+            break
+        if zdict and len(_compress(raw, zdict)) < len(raw) * ZDICT_NOVELTY:
+            continue
+        zdict = raw + zdict
+    return zdict[-ZDICT_MAX:]
+
+def _get_zdict(db: Session, kind: str, model, now: str) -> tuple[Optional[ArchiveDict], bool]:
+    """
+    يرجع (قاموس النوع، هل أُنشئ الآن). القاموس يُدرَّب مرة واحدة من أحدث سجلات الجدول
+    (وأغلبها ساخن) ويُعاد استخدامه في كل تشغيل لاحق.
+    """
+    row = db.query(ArchiveDict).filter(ArchiveDict.kind == kind).order_by(ArchiveDict.id.desc()).first()
+    if row:
+        return row, False
+    recent = db.query(model).order_by(model.created_at.desc()).limit(ZDICT_SAMPLES).all()
+    samples = [_row_payload(r) for r in recent]
+    if len(samples) < ZDICT_MIN_SAMPLES:
+        return None, False
+    zdict = _train_zdict(samples)
+    plain = sum(len(_compress(raw, None)) for raw in samples)
+    with_dict = sum(len(_compress(raw, zdict)) for raw in samples)
+    if with_dict + len(zdict) >= plain:
+        return None, False
+    row = ArchiveDict(kind=kind, data=zdict, created_at=now)
+    db.add(row)
+    db.commit()
+    return row, True
+
+def _is_latest(model, row):
+    # لا يوجد سجل أحدث لنفس المستخدم
+    newer = aliased(model)
+    return ~exists().where(newer.user_id == row.user_id, newer.created_at > row.created_at)
+
+def _is_hot(model, row):
+    """
+    شرط SQL للسجلات "الساخنة": آخر plan/evaluation/assessment لكل مستخدم،
+    بالإضافة لأي evaluation/assessment تشير إليها سجلات ساخنة.
+    """
+    cond = _is_latest(model, row)
+    if model is Evaluation:
+        p = aliased(Plan)
+        cond = or_(cond, exists().where(p.evaluation_id == row.id, _is_hot(Plan, p)))
+    elif model is Assessment:
+        e = aliased(Evaluation)
+        cond = or_(cond, exists().where(e.assessment_id == row.id, _is_hot(Evaluation, e)))
+    return cond
+
+def _superseded_query(db: Session, model, now: str, after_id: str):
+    # keyset على id: كل batch يكمل من حيث توقف السابق بدل البدء من أول الجدول
+    return (
+        db.query(model)
+        .filter(model.created_at <= now, model.id > after_id, ~_is_hot(model, model))
+        .order_by(model.id)
+        .limit(BATCH_SIZE)
+    )
+
+def _db_bytes(conn) -> tuple[int, int]:
+    page_size = conn.execute(text("PRAGMA page_size")).scalar()
+    page_count = conn.execute(text("PRAGMA page_count")).scalar()
+    freelist = conn.execute(text("PRAGMA freelist_count")).scalar()
+    return page_size * page_count, page_size * freelist
+
+def archive_superseded(db: Session) -> dict:
+    """ينقل السجلات غير الساخنة إلى الأرشيف ويرجع إحصائيات بالبايت."""
+    # السجلات المنشأة أثناء التشغيل لا تُؤرشف أبدًا
+    now = datetime.utcnow().isoformat() + "Z"
+    report = {"archived": {}, "raw_bytes": 0, "compressed_bytes": 0, "dict_bytes": 0}
+
+    for kind, model in KINDS.items():
+        moved = 0
+        zdict_row, created = _get_zdict(db, kind, model, now)
+        if created:
+            report["dict_bytes"] += len(zdict_row.data)
+            report["compressed_bytes"] += len(zdict_row.data)
+        zdict = zdict_row.data if zdict_row else None
+        last_id = ""
+        while True:
+            # الشرط يُعاد حسابه مع كل batch، فالخطط الجديدة تحمي ما تشير إليه
+            rows = _superseded_query(db, model, now, last_id).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            for r in rows:
+                raw = _row_payload(r)
+                # حذف مشروط: إذا تغيّر السجل بعد قراءته (مثل start_plan) نتركه
+                same = [getattr(model, c.key).is_not_distinct_from(getattr(r, c.key)) for c in model.__table__.columns]
+                deleted = db.query(model).filter(*same).delete(synchronize_session=False)
+                db.expunge(r)
+                if not deleted:
+                    continue
+                blob, dict_id = _compress(raw, None), None
+                if zdict:
+                    # zlib العادي إذا لم يكن القاموس أفضل لهذا السجل
+                    with_dict = _compress(raw, zdict)
+                    if len(with_dict) < len(blob):
+                        blob, dict_id = with_dict, zdict_row.id
+                db.add(ArchivedRecord(
+                    id=r.id,
+                    kind=kind,
+                    user_id=r.user_id,
+                    created_at=r.created_at,
+                    archived_at=now,
+                    dict_id=dict_id,
+                    raw_size=len(raw),
+                    payload=blob,
+                ))
+                report["raw_bytes"] += len(raw)
+                report["compressed_bytes"] += len(blob)
+                moved += 1
+            db.commit()
+        report["archived"][kind] = moved
+    return report
+
+def load_archived(db: Session, model, rid: str, user_id: str):
+    """
+    مسار القراءة الشفاف: يرجع كائن model (غير مضاف للـ session) من الأرشيف، أو None.
+    """
+    rec = (
+        db.query(ArchivedRecord)
+        .filter(ArchivedRecord.id == rid, ArchivedRecord.kind == _kind_of(model), ArchivedRecord.user_id == user_id)
+        .first()
+    )
+    if not rec:
+        return None
+    zdict = None
+    if rec.dict_id is not None:
+        zdict = db.query(ArchiveDict.data).filter(ArchiveDict.id == rec.dict_id).scalar()
+    data = json.loads(_decompress(rec.payload, zdict).decode("utf-8"))
+    return model(**data)
+
+def restore_archived(db: Session, model, rid: str, user_id: str):
+    """
+    يعيد السجل من الأرشيف إلى جدوله الأصلي (عند الكتابة عليه). الـ commit على المستدعي.
+    """
+    obj = load_archived(db, model, rid, user_id)
+    if obj is None:
+        return None
+    db.query(ArchivedRecord).filter(ArchivedRecord.id == rid).delete()
+    db.add(obj)
+    return obj
+
+def enable_incremental_vacuum():
+    # تغيير auto_vacuum لا يسري على قاعدة موجودة إلا بعد VACUUM كامل
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+
+def reclaim_space(full_vacuum: bool = False) -> dict:
+    """
+    incremental_vacuum إذا كانت القاعدة auto_vacuum=INCREMENTAL،
+    وإلا VACUUM كامل عند الطلب أو إذا تجاوزت الصفحات الفارغة VACUUM_FREELIST_RATIO.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        before, free = _db_bytes(conn)
+        mode = conn.execute(text("PRAGMA auto_vacuum")).scalar()
+        if mode == 2:
+            # pysqlite يحرر صفحة واحدة لكل step، executescript ينفّذه حتى النهاية
+            conn.connection.dbapi_connection.executescript("PRAGMA incremental_vacuum;")
+            action = "incremental_vacuum"
+        elif full_vacuum or (before and free / before >= VACUUM_FREELIST_RATIO):
+            conn.execute(text("VACUUM"))
+            action = "vacuum"
+        else:
+            action = "none"
+        after, _ = _db_bytes(conn)
+    return {"vacuum": action, "db_bytes_before": before, "db_bytes_after": after, "bytes_reclaimed": before - after}
+
+def run(full_vacuum: bool = False) -> dict:
+    from main import _auto_migrate  # الجداول + فهارس أعمدة الربط
+    _auto_migrate()
+    db = SessionLocal()
+    try:
+        report = archive_superseded(db)
+    finally:
+        db.close()
+    report.update(reclaim_space(full_vacuum))
+    return report
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Archive superseded assessments/evaluations/plans")
+    ap.add_argument("--vacuum", action="store_true", help="run a full VACUUM after archiving")
+    ap.add_argument("--enable-incremental", action="store_true", help="switch app.db to auto_vacuum=INCREMENTAL")
+    args = ap.parse_args()
+
+    if args.enable_incremental:
+        enable_incremental_vacuum()
+        print("✅ auto_vacuum=INCREMENTAL enabled")
+    print(json.dumps(run(args.vacuum), indent=2))
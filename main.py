@@ -1,25 +1,41 @@
+import os
+import time
+_T0 = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import EmailStr
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta, timezone
 import jwt
-from passlib.context import CryptContext
 from uuid import uuid4
 from sqlalchemy.orm import Session
 from sqlalchemy import text  # للترقية التلقائية
 
-from database import Base, engine, get_db
+from database import Base, engine, get_db, SessionLocal
 from models import User, Assessment, Evaluation, Plan
 from schemas import SignupIn, LoginIn, AssessmentIn, EvaluateIn, PlanIn
+from archive import load_archived, restore_archived  # قراءة السجلات المؤرشفة
 
 # rules engine
-from rules_engine import load_rules, build_plan, _clamp
+from rules_engine import get_rules, build_plan, _clamp
 
 JWT_SECRET = "dev-secret-change-me"
 JWT_ALG = "HS256"
 TOKEN_EXPIRE_DAYS = 7
-pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# fast: تأجيل passlib/bcrypt لأول signup/login | eager: تحميله أثناء الإقلاع
+STARTUP_MODE = os.getenv("STARTUP_MODE", "fast")
+
+_pwd_ctx = None
+
+def get_pwd_ctx():
+    global _pwd_ctx
+    if _pwd_ctx is None:
+        from passlib.context import CryptContext  # استيراد كسول (bcrypt ثقيل)
+        _pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_ctx
 
 app = FastAPI(title="Skill Quest Backend", version="1.4.0")
 
@@ -39,11 +55,12 @@ app.add_middleware(
 
 def _auto_migrate():
     """
-    يضمن وجود عمود advice_json في جدول plans (يُضاف تلقائيًا إذا ناقص).
+    يضمن وجود عمود advice_json في جدول plans (يُضاف تلقائيًا إذا ناقص)،
+    وفهارس أعمدة الربط التي يحتاجها archive.py.
     """
     with engine.begin() as conn:
         # إنشاء الجداول إن لم تكن موجودة
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=conn)
 
         # فحص أعمدة plans
         rows = conn.execute(text("PRAGMA table_info(plans)")).fetchall()
@@ -56,10 +73,48 @@ def _auto_migrate():
         else:
             print("ℹ️ DB migration: plans.advice_json already exists")
 
+        # create_all لا يضيف فهارس لجداول موجودة مسبقًا
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_evaluations_assessment_id ON evaluations (assessment_id)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_plans_evaluation_id ON plans (evaluation_id)"))
+
+# ⏱️ توقيت مراحل الإقلاع (يظهر في /healthz/ready)
+_startup = {"ready": False, "mode": STARTUP_MODE, "phases": {}}
+_startup["phases"]["imports"] = round((time.perf_counter() - _T0) * 1000, 1)
+
+def _phase(name, fn):
+    t = time.perf_counter()
+    fn()
+    _startup["phases"][name] = round((time.perf_counter() - t) * 1000, 1)
+
+def _warm_sql():
+    """
+    ينفّذ استعلامات الـ endpoints مرة واحدة حتى تدخل في compiled cache الخاص بـ SQLAlchemy.
+    """
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.email == "").first()
+        db.query(User).filter(User.id == "").first()
+        db.query(Assessment).filter(Assessment.id == "", Assessment.user_id == "").first()
+        db.query(Evaluation).filter(Evaluation.id == "", Evaluation.user_id == "").first()
+        db.query(Evaluation).filter(Evaluation.user_id == "").order_by(Evaluation.created_at.desc()).first()
+        db.query(Plan).filter(Plan.id == "", Plan.user_id == "").first()
+        db.query(Plan).filter(Plan.user_id == "").order_by(Plan.created_at.desc()).first()
+        load_archived(db, Plan, "", "")
+    finally:
+        db.close()
+
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(bind=engine)
-    _auto_migrate()
+    t = time.perf_counter()
+    _phase("migrate", _auto_migrate)
+    _phase("rules", get_rules)
+    _phase("sql_warmup", _warm_sql)
+    if STARTUP_MODE == "eager":
+        # تحميل backend الخاص بـ bcrypt يحدث عادةً مع أول hash
+        _phase("passlib", lambda: get_pwd_ctx().handler("bcrypt").get_backend())
+    _startup["phases"]["startup"] = round((time.perf_counter() - t) * 1000, 1)
+    _startup["total_ms"] = round((time.perf_counter() - _T0) * 1000, 1)
+    _startup["ready"] = True
 
 def make_token(user_id: str, email: EmailStr) -> str:
     now = datetime.now(timezone.utc)
@@ -99,7 +154,7 @@ def signup(body: SignupIn, db: Session = Depends(get_db)):
         id=str(uuid4()),
         name=(body.name or "User"),
         email=email,
-        pass_hash=pwd_ctx.hash(body.password),
+        pass_hash=get_pwd_ctx().hash(body.password),
     )
     db.add(u)
     db.commit()
@@ -109,7 +164,7 @@ def signup(body: SignupIn, db: Session = Depends(get_db)):
 def login(body: LoginIn, db: Session = Depends(get_db)):
     email = body.email.lower().strip()
     u = db.query(User).filter(User.email == email).first()
-    if not u or not pwd_ctx.verify(body.password, u.pass_hash):
+    if not u or not get_pwd_ctx().verify(body.password, u.pass_hash):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     token = make_token(u.id, u.email)
     return {"token": token}
@@ -173,6 +228,8 @@ def create_assessment(body: AssessmentIn, auth=Depends(require_auth), db: Sessio
 @app.get("/api/assessments/{aid}")
 def get_assessment(aid: str, auth=Depends(require_auth), db: Session = Depends(get_db)):
     a = db.query(Assessment).filter(Assessment.id == aid, Assessment.user_id == auth["sub"]).first()
+    if not a:
+        a = load_archived(db, Assessment, aid, auth["sub"])
     if not a:
         raise HTTPException(status_code=404, detail="Not found")
     return {
@@ -187,10 +244,12 @@ def get_assessment(aid: str, auth=Depends(require_auth), db: Session = Depends(g
 @app.post("/api/evaluate/", status_code=201)
 def evaluate(body: EvaluateIn, auth=Depends(require_auth), db: Session = Depends(get_db)):
     a = db.query(Assessment).filter(Assessment.id == body.assessmentId, Assessment.user_id == auth["sub"]).first()
+    if not a:
+        a = load_archived(db, Assessment, body.assessmentId, auth["sub"])
     if not a:
         raise HTTPException(status_code=404, detail="Assessment not found")
 
-    rules = load_rules()
+    rules = get_rules()
 
     # درجات الدومينات + overall من الأوزان في ملف القواعد
     raw_scores = a.get_scores() or {}
@@ -220,6 +279,8 @@ def evaluate(body: EvaluateIn, auth=Depends(require_auth), db: Session = Depends
 @app.get("/api/evaluate/{eid}")
 def get_evaluation(eid: str, auth=Depends(require_auth), db: Session = Depends(get_db)):
     e = db.query(Evaluation).filter(Evaluation.id == eid, Evaluation.user_id == auth["sub"]).first()
+    if not e:
+        e = load_archived(db, Evaluation, eid, auth["sub"])
     if not e:
         raise HTTPException(status_code=404, detail="Not found")
     return {
@@ -252,14 +313,18 @@ def get_latest_evaluation(auth=Depends(require_auth), db: Session = Depends(get_
 @app.post("/api/plans/", status_code=201)
 def create_plan(body: PlanIn, auth=Depends(require_auth), db: Session = Depends(get_db)):
     e = db.query(Evaluation).filter(Evaluation.id == body.evaluationId, Evaluation.user_id == auth["sub"]).first()
+    if not e:
+        e = load_archived(db, Evaluation, body.evaluationId, auth["sub"])
     if not e:
         raise HTTPException(status_code=404, detail="Evaluation not found")
 
     a = db.query(Assessment).filter(Assessment.id == e.assessment_id, Assessment.user_id == auth["sub"]).first()
+    if not a:
+        a = load_archived(db, Assessment, e.assessment_id, auth["sub"])
     signals = a.get_signals() if a else {}
     ds = e.get_domain_scores() or {}
 
-    rules = load_rules()
+    rules = get_rules()
     plan_out = build_plan(ds, signals, rules)
     items = plan_out["items"]
     advice = plan_out["advice"]
@@ -282,6 +347,8 @@ def create_plan(body: PlanIn, auth=Depends(require_auth), db: Session = Depends(
 @app.get("/api/plans/{pid}")
 def get_plan(pid: str, auth=Depends(require_auth), db: Session = Depends(get_db)):
     p = db.query(Plan).filter(Plan.id == pid, Plan.user_id == auth["sub"]).first()
+    if not p:
+        p = load_archived(db, Plan, pid, auth["sub"])
     if not p:
         raise HTTPException(status_code=404, detail="Not found")
     return {
@@ -317,6 +384,8 @@ def get_latest_plan(auth=Depends(require_auth), db: Session = Depends(get_db)):
 @app.post("/api/plans/{pid}/start")
 def start_plan(pid: str, auth=Depends(require_auth), db: Session = Depends(get_db)):
     p = db.query(Plan).filter(Plan.id == pid, Plan.user_id == auth["sub"]).first()
+    if not p:
+        p = restore_archived(db, Plan, pid, auth["sub"])
     if not p:
         raise HTTPException(status_code=404, detail="Not found")
     p.started_at = datetime.utcnow().isoformat() + "Z"
@@ -327,3 +396,9 @@ def start_plan(pid: str, auth=Depends(require_auth), db: Session = Depends(get_d
 @app.get("/api/ping")
 def ping():
     return "pong"
+
+@app.get("/healthz/ready")
+def ready():
+    # 200 مع توقيت كل مرحلة بالـ ms. uvicorn لا يقبل اتصالات قبل انتهاء startup،
+    # لذا 503 يظهر فقط إذا لم تُشغَّل مرحلة startup أصلًا (مثل --lifespan off)
+    return JSONResponse(_startup, status_code=200 if _startup["ready"] else 503)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text
+from sqlalchemy import Column, String, Text, Integer, LargeBinary
 from sqlalchemy.orm import Mapped, mapped_column
 from database import Base
 import json
@@ -31,7 +31,7 @@ class Evaluation(Base):
     __tablename__ = "evaluations"
     id: Mapped[str] = mapped_column(String, primary_key=True)
     user_id: Mapped[str] = mapped_column(String, index=True, nullable=False)
-    assessment_id: Mapped[str] = mapped_column(String, nullable=False)
+    assessment_id: Mapped[str] = mapped_column(String, index=True, nullable=False)
     domain_scores_json: Mapped[str] = mapped_column(Text, default="{}")
     created_at: Mapped[str] = mapped_column(String, nullable=False)
 
@@ -44,7 +44,7 @@ class Plan(Base):
     __tablename__ = "plans"
     id: Mapped[str] = mapped_column(String, primary_key=True)
     user_id: Mapped[str] = mapped_column(String, index=True, nullable=False)
-    evaluation_id: Mapped[str] = mapped_column(String, nullable=False)
+    evaluation_id: Mapped[str] = mapped_column(String, index=True, nullable=False)
     items_json: Mapped[str] = mapped_column(Text, default="[]")
     created_at: Mapped[str] = mapped_column(String, nullable=False)
     started_at: Mapped[str] = mapped_column(String, nullable=True)
@@ -60,3 +60,22 @@ class Plan(Base):
     def get_advice(self):
         try: return json.loads(self.advice_json or "[]")
         except: return []
+
+# ⇦ أرشيف مضغوط للسجلات القديمة (انظر archive.py)
+class ArchiveDict(Base):
+    __tablename__ = "archive_dicts"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String, nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    created_at: Mapped[str] = mapped_column(String, nullable=False)
+
+class ArchivedRecord(Base):
+    __tablename__ = "archived_records"
+    id: Mapped[str] = mapped_column(String, primary_key=True)  # نفس id السجل الأصلي
+    kind: Mapped[str] = mapped_column(String, index=True, nullable=False)
+    user_id: Mapped[str] = mapped_column(String, index=True, nullable=False)
+    created_at: Mapped[str] = mapped_column(String, nullable=False)
+    archived_at: Mapped[str] = mapped_column(String, nullable=False)
+    dict_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    raw_size: Mapped[int] = mapped_column(Integer, default=0)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
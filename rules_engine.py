@@ -1,4 +1,4 @@
-import yaml
+from functools import lru_cache
 from pathlib import Path
 
 def _clamp(v):
@@ -8,9 +8,15 @@ def _clamp(v):
         return 0
 
 def load_rules(path: str | Path = "skill_eval_rules.yaml") -> dict:
+    import yaml  # استيراد كسول: لا نحتاجه إلا عند قراءة ملف القواعد
     with open(path, "r", encoding="utf-8") as f:
         return yaml.safe_load(f)
 
+@lru_cache(maxsize=None)
+def get_rules(path: str = "skill_eval_rules.yaml") -> dict:
+    # نسخة مخزّنة: الملف يُقرأ مرة واحدة لكل worker (للقراءة فقط)
+    return load_rules(path)
+
 def level_of(score: int, thresholds: dict, resolver: dict) -> str:
     default = resolver.get("default", {})
     bands = [
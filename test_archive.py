@@ -0,0 +1,129 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import archive
+from database import Base
+from models import Assessment, Evaluation, Plan, ArchiveDict, ArchivedRecord
+
+def make_db():
+    eng = create_engine("sqlite://")
+    Base.metadata.create_all(bind=eng)
+    return sessionmaker(bind=eng)()
+
+def make_plan(pid, user_id, evaluation_id, created_at, n=10):
+    p = Plan(id=pid, user_id=user_id, evaluation_id=evaluation_id, created_at=created_at, started_at=None)
+    p.set_items([{"type": "resource", "domain": "prog", "title": f"دورة {i}", "week": i % 4 + 1} for i in range(n)])
+    p.set_advice(["راجعي الأساسيات"])
+    return p
+
+def seed(db, users=3, per_user=5):
+    for u in range(users):
+        for i in range(per_user):
+            ts = f"2024-01-0{i + 1}T00:00:00Z"
+            a = Assessment(id=f"a{u}{i}", user_id=f"u{u}", created_at=ts)
+            a.set_scores({"prog": 50 + i})
+            e = Evaluation(id=f"e{u}{i}", user_id=f"u{u}", assessment_id=f"a{u}{i}", created_at=ts)
+            e.set_domain_scores({"prog": 50 + i, "overall": 50 + i})
+            db.add_all([a, e, make_plan(f"p{u}{i}", f"u{u}", f"e{u}{i}", ts)])
+    db.commit()
+
+def ids(db, model):
+    return {r[0] for r in db.query(model.id)}
+
+def test_payload_round_trip():
+    db = make_db()
+    p = make_plan("p1", "u1", "e1", "2024-01-01T00:00:00Z")
+    raw = archive._row_payload(p)
+    zdict = archive._train_zdict([archive._row_payload(make_plan(f"s{i}", "u", "e", "t")) for i in range(5)])
+    for d in (None, zdict):
+        assert archive._decompress(archive._compress(raw, d), d) == raw
+
+    db.add(p)
+    db.commit()
+    db.add(make_plan("p2", "u1", "e1", "2024-02-01T00:00:00Z"))
+    db.commit()
+    archive.archive_superseded(db)
+    assert ids(db, Plan) == {"p2"}
+
+    restored = archive.load_archived(db, Plan, "p1", "u1")
+    assert archive._row_payload(restored) == raw
+    assert restored.get_items() == p.get_items()
+    assert archive.load_archived(db, Plan, "p1", "someone-else") is None
+
+def test_archive_keeps_latest_and_referenced_rows():
+    db = make_db()
+    seed(db)
+    # أحدث خطة لـ u0 تشير إلى تقييم قديم
+    db.query(Plan).filter(Plan.id == "p04").update({"evaluation_id": "e01"})
+    db.add(Evaluation(id="e-old", user_id="u1", assessment_id="a14", created_at="2024-01-03T00:00:00Z"))
+    # سجلات أُنشئت بعد بدء التشغيل (cutoff) لا تُؤرشف حتى لو لم تعد الأحدث
+    db.add(Evaluation(id="e-late", user_id="u2", assessment_id="a24", created_at="9999-01-01T00:00:00Z"))
+    db.add(Evaluation(id="e-later", user_id="u2", assessment_id="a24", created_at="9999-01-02T00:00:00Z"))
+    db.commit()
+
+    report = archive.archive_superseded(db)
+
+    assert ids(db, Plan) == {"p04", "p14", "p24"}
+    assert ids(db, Evaluation) == {"e04", "e01", "e14", "e24", "e-late", "e-later"}
+    assert ids(db, Assessment) == {"a04", "a01", "a14", "a24"}
+    assert report["archived"] == {"assessment": 11, "evaluation": 12, "plan": 12}
+    assert db.query(ArchivedRecord).count() == 35
+    assert archive.load_archived(db, Evaluation, "e-old", "u1") is not None
+    assert report["compressed_bytes"] >= report["dict_bytes"]
+
+def test_dictionary_is_reused_across_runs():
+    db = make_db()
+    seed(db, users=10, per_user=3)
+    archive.archive_superseded(db)
+    dicts = db.query(ArchiveDict).count()
+
+    db.add(make_plan("p-new", "u0", "e02", "2024-02-01T00:00:00Z"))
+    db.commit()
+    report = archive.archive_superseded(db)
+
+    assert report["archived"]["plan"] == 1
+    assert report["dict_bytes"] == 0
+    assert db.query(ArchiveDict).count() == dicts
+
+def test_row_changed_after_select_is_not_archived(monkeypatch):
+    db = make_db()
+    seed(db, users=1, per_user=3)
+    query = archive._superseded_query
+
+    class Rows:
+        def __init__(self, rows): self.rows = rows
+        def all(self): return self.rows
+
+    def racing_query(db, model, now, after_id):
+        rows = query(db, model, now, after_id).all()
+        if model is Plan and rows:
+            # start_plan يكتب بعد أن قرأ الـ job السجل
+            db.execute(text("UPDATE plans SET started_at = 'now' WHERE id = :id"), {"id": rows[0].id})
+        return Rows(rows)
+
+    monkeypatch.setattr(archive, "_superseded_query", racing_query)
+    report = archive.archive_superseded(db)
+
+    assert ids(db, Plan) == {"p00", "p02"}
+    assert db.query(Plan.started_at).filter(Plan.id == "p00").scalar() == "now"
+    assert report["archived"]["plan"] == 1
+
+def test_restore_archived_moves_row_back():
+    db = make_db()
+    seed(db, users=1, per_user=2)
+    archive.archive_superseded(db)
+
+    p = archive.restore_archived(db, Plan, "p00", "u0")
+    db.commit()
+    assert p is not None
+    assert "p00" in ids(db, Plan)
+    assert db.query(ArchivedRecord).filter(ArchivedRecord.id == "p00").count() == 0
+
+def test_superseded_query_uses_indexes():
+    db = make_db()
+    for model in (Assessment, Evaluation, Plan):
+        stmt = archive._superseded_query(db, model, "2024-01-01T00:00:00Z", "").statement
+        sql = str(stmt.compile(compile_kwargs={"literal_binds": True}))
+        plan = [r[-1] for r in db.execute(text("EXPLAIN QUERY PLAN " + sql))]
+        # لا يوجد SCAN كامل: الجدول الخارجي والاستعلامات المتداخلة كلها تستخدم فهارس
+        assert not [d for d in plan if d.startswith("SCAN")], plan
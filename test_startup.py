@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import main
+import rules_engine
+
+def test_fast_mode_defers_heavy_imports():
+    code = "import sys, main; print('passlib' in sys.modules, 'yaml' in sys.modules)"
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, STARTUP_MODE="fast"),
+    )
+    assert out.stdout.split() == ["False", "False"]
+
+def test_ready_reports_phase_timings(monkeypatch):
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    monkeypatch.setattr(main, "engine", eng)
+    monkeypatch.setattr(main, "SessionLocal", sessionmaker(bind=eng))
+    with TestClient(main.app) as c:
+        r = c.get("/healthz/ready")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["ready"] is True
+    for phase in ("imports", "migrate", "rules", "sql_warmup"):
+        assert body["phases"][phase] >= 0
+
+def test_get_rules_reads_file_once(monkeypatch):
+    calls = []
+    load = rules_engine.load_rules
+    monkeypatch.setattr(rules_engine, "load_rules", lambda path: calls.append(path) or load(path))
+    rules_engine.get_rules.cache_clear()
+    try:
+        first = rules_engine.get_rules()
+        assert rules_engine.get_rules() is first
+        assert calls == ["skill_eval_rules.yaml"]
+    finally:
+        rules_engine.get_rules.cache_clear()